@@ -1,11 +1,11 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models.database import db, User, Integration, Campaign, Transaction, SMSHistory
+from models.database import db, engine_options, upgrade_schema, User, Integration, Campaign, Transaction, SMSHistory
+from models.routing import REPLICA_BIND, read_replica
 from werkzeug.security import generate_password_hash
 import os
 import logging
 from datetime import datetime
-from celery import Celery
 import json
 from functools import wraps
 
@@ -13,23 +13,65 @@ from functools import wraps
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize extensions
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Configure Celery
-app.config['CELERY_BROKER_URL'] = 'redis://localhost:6379/0'
-app.config['CELERY_RESULT_BACKEND'] = 'redis://localhost:6379/0'
-
-celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'])
-celery.conf.update(app.config)
+def create_app(config=None):
+    """Build the Flask app.
+
+    Nothing here touches the database or the broker: connections are opened
+    on first use and the schema is created by ``flask init-db``.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.urandom(24)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Optional read replica for reporting queries
+    replica_url = os.getenv('DATABASE_REPLICA_URL')
+    if replica_url:
+        replica_options = engine_options(
+            replica_url,
+            prefix='REPLICA_DB',
+            connect_timeout=int(os.getenv('REPLICA_CONNECT_TIMEOUT', 2)),
+        )
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND: {'url': replica_url, **replica_options}
+        }
+    app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    register_routes(app)
+    app.cli.command('init-db')(init_db)
+    return app
+
+def get_celery(app=None):
+    """Celery client for the app, bound on first use.
+
+    This is the worker's own instance, so web and worker processes share one
+    broker configuration and connection pool.
+    """
+    app = app or current_app
+    if 'celery' not in app.extensions:
+        # Imported here so web processes and CLIs that never enqueue skip it
+        from celery_worker import celery
+        app.extensions['celery'] = celery
+    return app.extensions['celery']
+
+def init_db():
+    """Upgrade existing tables and create any missing ones."""
+    for step in upgrade_schema():
+        print(f"Upgraded: {step}")
+    db.create_all()
+    print("Database tables are up to date")
 
 def admin_required(f):
     @wraps(f)
@@ -44,7 +86,6 @@ def admin_required(f):
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -60,7 +101,6 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -80,16 +120,15 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Logout realizado com sucesso!', 'success')
     return redirect(url_for('login'))
 
-@app.route('/admin')
 @login_required
 @admin_required
+@read_replica
 def admin_dashboard():
     users = User.query.all()
     stats = {
@@ -107,7 +146,6 @@ def calculate_success_rate():
     success = SMSHistory.query.filter_by(status='success').count()
     return round((success / total) * 100)
 
-@app.route('/api/users', methods=['POST'])
 @login_required
 @admin_required
 def create_user():
@@ -128,7 +166,6 @@ def create_user():
     
     return jsonify({'message': 'User created successfully'}), 201
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
 @login_required
 @admin_required
 def delete_user(user_id):
@@ -141,7 +178,6 @@ def delete_user(user_id):
     
     return jsonify({'message': 'User deleted successfully'})
 
-@app.route('/api/users/<int:user_id>/credits', methods=['POST'])
 @login_required
 @admin_required
 def manage_credits(user_id):
@@ -161,13 +197,19 @@ def manage_credits(user_id):
     db.session.commit()
     return jsonify({'message': 'Credits updated successfully'})
 
-@app.route('/')
 @login_required
 def dashboard():
     return redirect(url_for('campaigns'))
 
-with app.app_context():
-    db.create_all()
+def register_routes(app):
+    app.add_url_rule('/login', view_func=login, methods=['GET', 'POST'])
+    app.add_url_rule('/register', view_func=register, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', view_func=logout)
+    app.add_url_rule('/admin', view_func=admin_dashboard)
+    app.add_url_rule('/api/users', view_func=create_user, methods=['POST'])
+    app.add_url_rule('/api/users/<int:user_id>', view_func=delete_user, methods=['DELETE'])
+    app.add_url_rule('/api/users/<int:user_id>/credits', view_func=manage_credits, methods=['POST'])
+    app.add_url_rule('/', view_func=dashboard)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=80, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=80, debug=False)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from models.archive import archive_sms_history, archive_sms_log
+from app import create_app
+import sys
+
+DEFAULT_RETENTION_DAYS = 90
+
+def archive_history(days=DEFAULT_RETENTION_DAYS):
+    try:
+        app = create_app()
+        with app.app_context():
+            moved = archive_sms_history(days)
+            print(f"SMS history rows archived: {moved}")
+        logged = archive_sms_log(days)
+        print(f"SMS log entries archived: {logged}")
+        return True
+    except Exception as e:
+        print(f"Error during archival: {str(e)}")
+        return False
+
+if __name__ == '__main__':
+    archive_history(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RETENTION_DAYS)
@@ -0,0 +1,47 @@
+"""Fan-out benchmark: pipelined enqueue_sms_batch() vs per-message delay().
+
+Needs a Redis broker at REDIS_URL (default redis://localhost:6379/0). The
+queue used is emptied before and after the run.
+
+    python bench_enqueue.py [messages]
+"""
+import sys
+import time
+
+from celery_worker import celery, enqueue_sms_batch, send_sms_task
+
+QUEUE = 'bench_enqueue'
+DELAY_SAMPLE = 2000
+
+def _calls(n):
+    return ({'phone': f"55119{i:08d}", 'message': 'Seu pedido foi aprovado', 'event_type': 'campaign'}
+            for i in range(n))
+
+def _purge():
+    with celery.connection_for_write() as conn:
+        conn.default_channel.client.delete(QUEUE)
+
+def main(n=100000):
+    _purge()
+    try:
+        start = time.perf_counter()
+        enqueue_sms_batch(_calls(n), queue=QUEUE)
+        batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for kwargs in _calls(DELAY_SAMPLE):
+            send_sms_task.apply_async(kwargs=kwargs, queue=QUEUE)
+        per_message = (time.perf_counter() - start) / DELAY_SAMPLE
+
+        with celery.connection_for_write() as conn:
+            queued = conn.default_channel.client.llen(QUEUE)
+    finally:
+        _purge()
+
+    print(f"enqueue_sms_batch: {n} messages in {batch:.3f}s ({n / batch:,.0f} msg/s)")
+    print(f"apply_async:       {per_message * 1e6:.0f} us/message, "
+          f"~{per_message * n:.1f}s for {n} messages")
+    print(f"messages queued:   {queued}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,86 @@
+"""Cold-start benchmark: the old import-time app.py vs the app factory.
+
+Each scenario runs in a fresh interpreter and reports wall time (after
+interpreter start) and peak RSS, as medians over several runs. "baseline"
+imports app.py from a checkout of BASELINE_REV, which builds the app and
+its Celery client and runs create_all() at import time. The other rows are
+what web, worker and CLI processes pay in the current tree.
+
+Uses DATABASE_URL if set, otherwise a SQLite file in a temp directory, so
+the baseline's create_all() talks to a real database.
+
+    python bench_startup.py [runs] [baseline-rev]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = {
+    'baseline app.py': ('baseline', "import app"),
+    'models only': ('current', "import models.database"),
+    'import app': ('current', "import app"),
+    'create_app()': ('current', "import app; app.create_app()"),
+}
+
+PROBE = """
+import resource, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def _git(*args):
+    return subprocess.run(['git', *args], cwd=HERE, capture_output=True, text=True, check=True).stdout
+
+def checkout(rev, directory):
+    """Export ``rev`` into ``directory`` without touching the working tree"""
+    archive = subprocess.run(['git', 'archive', rev], cwd=HERE, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+
+def run(code, cwd, env, runs):
+    times, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE.format(code=code)],
+            env=env, cwd=cwd, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[-2]))
+        rss.append(int(out[-1]))
+    return statistics.median(times), statistics.median(rss)
+
+def main(runs=10, baseline_rev=None):
+    baseline_rev = baseline_rev or _git('rev-list', '--max-parents=0', 'HEAD').split()[0]
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        baseline_dir = os.path.join(workdir, 'baseline')
+        os.makedirs(baseline_dir)
+        checkout(baseline_rev, baseline_dir)
+        trees = {'baseline': baseline_dir, 'current': HERE}
+
+        env = dict(os.environ)
+        env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        # Warm-up so the baseline's create_all() checks existing tables, as on a
+        # normal restart, and the OS file cache is hot for every scenario
+        for tree, code in SCENARIOS.values():
+            run(code, trees[tree], env, 1)
+
+        results = {name: run(code, trees[tree], env, runs) for name, (tree, code) in SCENARIOS.items()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    base_time, base_rss = results['baseline app.py']
+    print(f"baseline {baseline_rev[:10]}, {runs} runs, DATABASE_URL={env['DATABASE_URL'].split('@')[-1]}")
+    print(f"{'scenario':<18}{'time (ms)':>12}{'saved':>8}{'max RSS (MB)':>15}{'saved':>8}")
+    for name, (elapsed, rss) in results.items():
+        # ru_maxrss is reported in KiB on Linux
+        print(f"{name:<18}{elapsed * 1000:>12.1f}{(1 - elapsed / base_time) * 100:>7.0f}%"
+              f"{rss / 1024:>15.1f}{(1 - rss / base_rss) * 100:>7.0f}%")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10, sys.argv[2] if len(sys.argv) > 2 else None)
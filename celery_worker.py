@@ -1,14 +1,30 @@
 from celery import Celery
+from celery.signals import before_task_publish, after_task_publish
+from kombu.utils.json import JSONEncoder, dumps as json_dumps
+from kombu.utils.uuid import uuid
 import requests
 import json
+from base64 import b64encode
 import os
 import re
+import fcntl
 from datetime import datetime
 
-# Initialize Celery
-celery = Celery('sms_tasks',
-                broker='redis://localhost:6379/0',
-                backend='redis://localhost:6379/0')
+# Initialize Celery; the Flask side reuses this instance via app.get_celery()
+BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+celery = Celery('sms_tasks', broker=BROKER_URL, backend=BROKER_URL)
+celery.conf.update(
+    broker_pool_limit=int(os.environ.get('BROKER_POOL_LIMIT', 10)),
+    broker_transport_options={'max_connections': int(os.environ.get('REDIS_MAX_CONNECTIONS', 20))},
+    redis_max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', 20)),
+)
+
+# Messages per LPUSH in enqueue_batch()
+ENQUEUE_CHUNK_SIZE = 10000
+
+# Same output as kombu's json serializer without building an encoder per call
+_encode_json = JSONEncoder().encode
 
 # SMS API Configuration
 SMS_API_ENDPOINT = "https://api.smsdev.com.br/v1/send"
@@ -34,12 +50,6 @@ def format_phone_number(phone):
     return numbers
 
 def log_sms_attempt(campaign_id, phone, message, status, api_response, event_type):
-    try:
-        with open('data/sms_history.json', 'r') as f:
-            history = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        history = []
-    
     entry = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "phone": phone,
@@ -50,10 +60,131 @@ def log_sms_attempt(campaign_id, phone, message, status, api_response, event_typ
         "event_type": event_type
     }
     
-    history.append(entry)
-    
-    with open('data/sms_history.json', 'w') as f:
+    # Lock so the archival job never rewrites the file mid-append
+    with open('data/sms_history.json', 'a+') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        f.seek(0)
+        try:
+            history = json.load(f)
+        except json.JSONDecodeError:
+            history = []
+        
+        history.append(entry)
+        
+        f.seek(0)
+        f.truncate()
         json.dump(history, f, indent=2)
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+_PLACEHOLDERS = re.compile(r'__TASK_ID__|"__KWARGSREPR__"|__BODY__')
+_SLOTS = {'__TASK_ID__': 0, '"__KWARGSREPR__"': 1, '__BODY__': 2}
+
+def _batch_template(channel, task, queue):
+    """Render the Redis list entry for one ``task`` message as fixed pieces.
+
+    The envelope kombu would LPUSH for ``task.apply_async(kwargs=...)`` is
+    identical across a fan-out except for the task id, the kwargs and their
+    repr, so it is built once with placeholders. Returns the literal pieces,
+    the slot (id, kwargsrepr, body) that goes after each piece but the last,
+    and the JSON tail of the task body.
+    """
+    headers, properties, body, _ = celery.amqp.create_task_message(
+        '__TASK_ID__', task.name, (), {}, root_id='__TASK_ID__', kwargsrepr='__KWARGSREPR__',
+    )
+    message = channel.prepare_message(
+        '__BODY__', 0, 'application/json', 'utf-8', headers, dict(properties, delivery_mode=2),
+    )
+    message['properties'].update(
+        body_encoding='base64',
+        delivery_tag='__TASK_ID__',
+        delivery_info={'exchange': '', 'routing_key': queue},
+    )
+    rendered = json_dumps(message)
+    pieces = _PLACEHOLDERS.split(rendered)
+    slots = [_SLOTS[m] for m in _PLACEHOLDERS.findall(rendered)]
+    return pieces, slots, ', ' + json_dumps(body[2]) + ']'
+
+# Task attributes apply_async turns into message options; the batch envelope
+# is rendered without them, so any of these being set forces the fallback
+_TASK_PUBLISH_OPTIONS = (
+    'time_limit', 'soft_time_limit', 'expires', 'priority', 'queue',
+    'routing_key', 'exchange', 'delivery_mode', 'compression',
+)
+
+def _batch_supported(task):
+    """True if enqueue_batch() can write ``task`` messages directly to Redis.
+
+    The hand-built envelope only covers protocol 2, JSON, no compression,
+    default priority and delivery mode, no per-task limits/expiry/routing and
+    results not ignored; publish signals would also be skipped, so any of
+    those fall back to apply_async.
+    """
+    conf = celery.conf
+    if (
+        task.serializer != 'json'
+        or task.ignore_result
+        or any(getattr(task, option, None) is not None for option in _TASK_PUBLISH_OPTIONS)
+        or conf.task_compression
+        or conf.task_protocol == 1
+        or conf.task_routes
+        or conf.task_always_eager
+        or conf.task_default_priority is not None
+        or conf.task_queue_max_priority is not None
+        or conf.task_default_delivery_mode not in ('persistent', 2)
+        or before_task_publish.receivers
+        or after_task_publish.receivers
+    ):
+        return False
+    # Inspecting the transport does not open a connection
+    with celery.connection_for_write() as conn:
+        return conn.transport.driver_type == 'redis'
+
+def enqueue_batch(task, calls, queue=None, chunk_size=ENQUEUE_CHUNK_SIZE):
+    """Enqueue ``task`` once per kwargs dict in ``calls``.
+
+    Messages are written as one multi-value LPUSH per ``chunk_size`` entries
+    over a connection from the shared broker pool, instead of one round trip
+    per ``task.delay()``. The batch path sends no before/after_task_publish
+    signals, ignores task_routes and does not subscribe to results; when any
+    of that matters (see _batch_supported) it falls back to apply_async.
+    Returns the task ids in order.
+    """
+    queue = queue or celery.conf.task_default_queue
+    if not _batch_supported(task):
+        return [task.apply_async(kwargs=kwargs, queue=queue).id for kwargs in calls]
+
+    maxsize = celery.amqp.kwargsrepr_maxsize
+    task_ids = []
+    with celery.pool.acquire(block=True) as conn:
+        channel = conn.default_channel
+        pieces, slots, body_tail = _batch_template(channel, task, queue)
+        last = pieces[-1]
+        layout = list(zip(pieces, slots))
+        # One random prefix per batch keeps ids unique without a uuid4() per message
+        prefix = uuid()[:24]
+        with channel.conn_or_acquire() as client:
+            chunk = []
+            for i, kwargs in enumerate(calls):
+                task_id = f"{prefix}{i:012x}"
+                encoded = _encode_json(kwargs)
+                # Capped like Celery's saferepr, at a fraction of its cost
+                kwargsrepr = repr(kwargs)
+                if len(kwargsrepr) > maxsize:
+                    kwargsrepr = kwargsrepr[:maxsize - 3] + '...'
+                values = (
+                    task_id,
+                    json.dumps(kwargsrepr),
+                    b64encode(('[[], ' + encoded + body_tail).encode()).decode(),
+                )
+                chunk.append(''.join([piece + values[slot] for piece, slot in layout]) + last)
+                task_ids.append(task_id)
+                if len(chunk) == chunk_size:
+                    # LPUSH of many values keeps FIFO order for the BRPOP consumer
+                    client.lpush(queue, *chunk)
+                    chunk = []
+            if chunk:
+                client.lpush(queue, *chunk)
+    return task_ids
 
 @celery.task(bind=True, max_retries=3)
 def send_sms_task(self, phone, message, operator="claro", campaign_id=None, event_type="manual"):
@@ -128,3 +259,7 @@ def send_sms_task(self, phone, message, operator="claro", campaign_id=None, even
         retry_count = self.request.retries
         backoff = 60 * (2 ** retry_count)  # 60s, 120s, 240s
         raise self.retry(exc=e, countdown=backoff)
+
+def enqueue_sms_batch(calls, queue=None):
+    """Fan out send_sms_task; ``calls`` yields its kwargs (phone, message, ...)"""
+    return enqueue_batch(send_sms_task, calls, queue=queue)
@@ -1,12 +1,16 @@
-from models.database import db, User, Integration, Campaign, Transaction, SMSHistory
+from models.database import db, upgrade_schema, User, Integration, Campaign, SMSHistory
+from models.transactions import ingest_transaction_events
 import json
 import os
-from app import app
+from app import create_app
 
 def migrate_data():
     try:
+        app = create_app()
         with app.app_context():
-            # Create tables
+            # Upgrade existing tables, then create missing ones
+            for step in upgrade_schema():
+                print(f"Upgraded: {step}")
             db.create_all()
             print("Tables created successfully")
             
@@ -67,20 +71,9 @@ def migrate_data():
             if os.path.exists(transactions_file):
                 with open(transactions_file, 'r') as f:
                     transactions = json.load(f)
-                    for transaction_data in transactions:
-                        existing_transaction = Transaction.query.filter_by(transaction_id=transaction_data['transaction_id']).first()
-                        if not existing_transaction:
-                            transaction = Transaction(
-                                transaction_id=transaction_data['transaction_id'],
-                                customer_name=transaction_data.get('customer_name'),
-                                customer_phone=transaction_data.get('customer_phone'),
-                                customer_email=transaction_data.get('customer_email'),
-                                product_name=transaction_data.get('product_name'),
-                                total_price=transaction_data.get('total_price'),
-                                pix_code=transaction_data.get('pix_code'),
-                                status=transaction_data.get('status')
-                            )
-                            db.session.add(transaction)
+                    result = ingest_transaction_events(transactions)
+                    print(f"Transactions applied: {result['applied']}, "
+                          f"unchanged: {result['rejected']}, invalid: {result['invalid']}")
                 print("Transactions migrated successfully")
             
             # Migrate SMS history
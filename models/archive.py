@@ -0,0 +1,209 @@
+import datetime
+import fcntl
+import gzip
+import json
+import logging
+import os
+import uuid
+
+from models.database import db, SMSHistory
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/archive'
+SMS_LOG_FILE = 'data/sms_history.json'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Columns with few distinct values are dictionary-encoded inside a segment
+DICTIONARY_COLUMNS = {'status', 'type', 'event_type'}
+
+SMS_HISTORY_COLUMNS = ('id', 'phone', 'message', 'type', 'status', 'user_id', 'created_at')
+SMS_LOG_COLUMNS = ('timestamp', 'phone', 'message', 'status', 'api_response', 'campaign_id', 'event_type')
+
+# dataset -> (timestamp column, user column or None)
+DATASETS = {
+    'sms_history': ('created_at', 'user_id'),
+    'sms_log': ('timestamp', None),
+}
+
+def _partition_dir(dataset, day):
+    return os.path.join(ARCHIVE_DIR, dataset, f"date={day}")
+
+def _encode_column(name, values):
+    if name not in DICTIONARY_COLUMNS:
+        return {'values': values}
+    dictionary = sorted({v for v in values if v is not None})
+    codes = {v: i for i, v in enumerate(dictionary)}
+    return {
+        'dictionary': dictionary,
+        'codes': [None if v is None else codes[v] for v in values],
+    }
+
+def _decode_column(column):
+    if 'dictionary' not in column:
+        return column['values']
+    dictionary = column['dictionary']
+    return [None if c is None else dictionary[c] for c in column['codes']]
+
+def write_segment(dataset, day, rows, columns):
+    """Write rows for one day as a gzip-compressed columnar segment.
+
+    A small ``.meta.json`` next to the segment carries the row count and
+    the distinct users/statuses so scans can skip it without decompressing.
+    """
+    user_column = DATASETS[dataset][1]
+    directory = _partition_dir(dataset, day)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{uuid.uuid4().hex[:12]}"
+    path = os.path.join(directory, f"{name}.json.gz")
+
+    payload = {
+        'columns': {c: _encode_column(c, [row.get(c) for row in rows]) for c in columns},
+    }
+    meta = {
+        'rows': len(rows),
+        'statuses': sorted({row.get('status') for row in rows if row.get('status') is not None}),
+        'users': sorted({row.get(user_column) for row in rows if row.get(user_column) is not None})
+        if user_column else None,
+    }
+
+    # Write to temp names and rename so a crash never leaves a half segment
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    with open(os.path.join(directory, f"{name}.meta.json.tmp"), 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.tmp', path)
+    os.replace(os.path.join(directory, f"{name}.meta.json.tmp"),
+               os.path.join(directory, f"{name}.meta.json"))
+    return path
+
+def _group_by_day(rows, timestamp_column):
+    days = {}
+    for row in rows:
+        days.setdefault(row[timestamp_column][:10], []).append(row)
+    return days
+
+def archive_sms_history(days, batch_size=5000):
+    """Move SMSHistory rows older than ``days`` into archive segments.
+
+    Each batch is written to disk before its rows are deleted, so a failure
+    can at worst leave a row both archived and in the table, never lost.
+    Returns the number of rows moved.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    moved = 0
+    while True:
+        batch = (SMSHistory.query
+                 .filter(SMSHistory.created_at < cutoff)
+                 .order_by(SMSHistory.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        rows = [{
+            'id': sms.id,
+            'phone': sms.phone,
+            'message': sms.message,
+            'type': sms.type,
+            'status': sms.status,
+            'user_id': sms.user_id,
+            'created_at': sms.created_at.strftime(TIMESTAMP_FORMAT),
+        } for sms in batch]
+        for day, day_rows in _group_by_day(rows, 'created_at').items():
+            write_segment('sms_history', day, day_rows, SMS_HISTORY_COLUMNS)
+        try:
+            SMSHistory.query.filter(SMSHistory.id.in_([r['id'] for r in rows])) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error deleting archived SMS history: {str(e)}")
+            raise
+        moved += len(rows)
+    logger.info(f"Archived {moved} SMS history rows older than {days} days")
+    return moved
+
+def archive_sms_log(days, log_file=SMS_LOG_FILE):
+    """Move JSON-log entries older than ``days`` out of ``log_file``"""
+    if not os.path.exists(log_file):
+        return 0
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+    with open(log_file, 'r+') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            history = json.load(f)
+        except json.JSONDecodeError:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            return 0
+        # Entries without a timestamp cannot be partitioned; they stay in the log
+        old, kept = [], []
+        for entry in history:
+            timestamp = entry.get('timestamp')
+            (old if timestamp and timestamp < cutoff else kept).append(entry)
+        if old:
+            for day, day_rows in _group_by_day(old, 'timestamp').items():
+                write_segment('sms_log', day, day_rows, SMS_LOG_COLUMNS)
+            f.seek(0)
+            json.dump(kept, f, indent=2)
+            f.truncate()
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    logger.info(f"Archived {len(old)} SMS log entries older than {days} days")
+    return len(old)
+
+def _day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)[:10]
+
+def _as_set(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return set(value)
+    return {value}
+
+def scan(dataset, start=None, end=None, user_id=None, status=None):
+    """Lazily yield archived rows as dicts, oldest partition first.
+
+    ``start``/``end`` are inclusive dates and prune whole partitions;
+    ``user_id``/``status`` (a value or a collection) skip segments via their
+    metadata before any decompression, then filter the remaining rows.
+    """
+    user_column = DATASETS[dataset][1]
+    if user_id is not None and user_column is None:
+        raise ValueError(f"Dataset {dataset} has no user column")
+    start, end = _day(start), _day(end)
+    users, statuses = _as_set(user_id), _as_set(status)
+
+    root = os.path.join(ARCHIVE_DIR, dataset)
+    if not os.path.isdir(root):
+        return
+    for partition in sorted(os.listdir(root)):
+        if not partition.startswith('date='):
+            continue
+        day = partition[5:]
+        if (start and day < start) or (end and day > end):
+            continue
+        directory = os.path.join(root, partition)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.meta.json'):
+                continue
+            with open(os.path.join(directory, name)) as f:
+                meta = json.load(f)
+            if statuses is not None and not statuses.intersection(meta['statuses']):
+                continue
+            if users is not None and not users.intersection(meta['users']):
+                continue
+            segment = os.path.join(directory, name[:-len('.meta.json')] + '.json.gz')
+            with gzip.open(segment, 'rt', encoding='utf-8') as f:
+                columns = {c: _decode_column(v) for c, v in json.load(f)['columns'].items()}
+            for i in range(meta['rows']):
+                if statuses is not None and columns['status'][i] not in statuses:
+                    continue
+                if users is not None and columns[user_column][i] not in users:
+                    continue
+                yield {c: values[i] for c, values in columns.items()}
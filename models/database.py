@@ -1,9 +1,33 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 import datetime
+import enum
+import logging
+import os
+from sqlalchemy import inspect, text
 from werkzeug.security import generate_password_hash, check_password_hash
+from models.routing import RoutingSession
 
-db = SQLAlchemy()
+logger = logging.getLogger(__name__)
+
+db = SQLAlchemy(
+    session_options={'class_': RoutingSession},
+    engine_options={'pool_pre_ping': True},
+)
+
+def engine_options(url, prefix='DB', connect_timeout=None):
+    """Pool settings for a server database, overridable via <prefix>_POOL_* env vars"""
+    if not url or url.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': int(os.getenv(f'{prefix}_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv(f'{prefix}_POOL_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv(f'{prefix}_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv(f'{prefix}_POOL_RECYCLE', 1800)),
+    }
+    if connect_timeout is not None and url.startswith('postgres'):
+        options['connect_args'] = {'connect_timeout': connect_timeout}
+    return options
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -101,6 +125,63 @@ class Campaign(db.Model):
         }
         return data
 
+class TransactionStatus(enum.IntEnum):
+    PENDING = 1
+    APPROVED = 2
+    REFUSED = 3
+    EXPIRED = 4
+    REFUNDED = 5
+    CHARGEBACK = 6
+
+    @classmethod
+    def parse(cls, value):
+        """Accept an enum member, its code (int or digit string) or the gateway status string"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, bool):
+            raise ValueError(f"Unknown transaction status: {value!r}")
+        if isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit()):
+            try:
+                return cls(int(value))
+            except ValueError:
+                raise ValueError(f"Unknown transaction status: {value!r}")
+        try:
+            return cls[str(value).strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown transaction status: {value!r}")
+
+# Allowed forward moves; anything else (including repeats) is a no-op
+TRANSACTION_TRANSITIONS = {
+    TransactionStatus.PENDING: {
+        TransactionStatus.APPROVED,
+        TransactionStatus.REFUSED,
+        TransactionStatus.EXPIRED,
+    },
+    TransactionStatus.APPROVED: {
+        TransactionStatus.REFUNDED,
+        TransactionStatus.CHARGEBACK,
+    },
+}
+
+class TransactionStatusType(db.TypeDecorator):
+    """Stores a TransactionStatus as a SMALLINT code"""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(TransactionStatus.parse(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        # parse() also copes with free-text statuses left by a not yet upgraded table
+        try:
+            return TransactionStatus.parse(value)
+        except ValueError:
+            return None
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
@@ -111,7 +192,15 @@ class Transaction(db.Model):
     product_name = db.Column(db.String(200))
     total_price = db.Column(db.Numeric(10, 2))
     pix_code = db.Column(db.Text)
-    status = db.Column(db.String(20))
+    status = db.Column(TransactionStatusType, nullable=False, default=TransactionStatus.PENDING)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class TransactionStatusHistory(db.Model):
+    __tablename__ = 'transaction_status_history'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False, index=True)
+    status = db.Column(TransactionStatusType, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
 class SMSHistory(db.Model):
@@ -124,3 +213,57 @@ class SMSHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     user = db.relationship('User', backref=db.backref('sms_history', lazy=True))
+
+def _legacy_status_code(column):
+    """SQL mapping a free-text status to its TransactionStatus code (unknown -> PENDING)"""
+    whens = ' '.join(f"WHEN '{status.name.lower()}' THEN {int(status)}" for status in TransactionStatus)
+    return f"COALESCE(CASE lower({column}) {whens} END, {int(TransactionStatus.PENDING)})"
+
+def upgrade_schema():
+    """Bring a transactions table created before the status state machine up to date.
+
+    Adds ``updated_at`` and converts the free-text ``status`` column to
+    SMALLINT TransactionStatus codes. Safe to run repeatedly; returns a
+    description of each step applied.
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table('transactions'):
+        return []
+    columns = {c['name']: c for c in inspector.get_columns('transactions')}
+    steps = []
+    with db.engine.begin() as conn:
+        if 'updated_at' not in columns:
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN updated_at TIMESTAMP"))
+            conn.execute(text("UPDATE transactions SET updated_at = created_at"))
+            steps.append("added transactions.updated_at")
+
+        if not isinstance(columns['status']['type'], db.Integer):
+            known = ', '.join(f"'{status.name.lower()}'" for status in TransactionStatus)
+            unknown = conn.execute(text(
+                f"SELECT COUNT(*) FROM transactions WHERE status IS NULL OR lower(status) NOT IN ({known})"
+            )).scalar()
+            if unknown:
+                logger.warning(f"{unknown} transactions have an unknown status; stored as pending")
+
+            if db.engine.dialect.name == 'postgresql':
+                conn.execute(text(
+                    "ALTER TABLE transactions ALTER COLUMN status TYPE SMALLINT "
+                    f"USING {_legacy_status_code('status')}"
+                ))
+                conn.execute(text("ALTER TABLE transactions ALTER COLUMN status SET NOT NULL"))
+            else:
+                # SQLite cannot change a column type: rebuild the table. Legacy
+                # rename keeps other tables' foreign keys pointing at "transactions".
+                names = [c.name for c in Transaction.__table__.columns]
+                selected = [_legacy_status_code('status') if n == 'status' else n for n in names]
+                conn.execute(text("PRAGMA legacy_alter_table = ON"))
+                conn.execute(text("ALTER TABLE transactions RENAME TO transactions_legacy"))
+                Transaction.__table__.create(conn)
+                conn.execute(text(
+                    f"INSERT INTO transactions ({', '.join(names)}) "
+                    f"SELECT {', '.join(selected)} FROM transactions_legacy"
+                ))
+                conn.execute(text("DROP TABLE transactions_legacy"))
+                conn.execute(text("PRAGMA legacy_alter_table = OFF"))
+            steps.append("converted transactions.status to status codes")
+    return steps
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# engine -> (checked_at, healthy), shared by every session in the process
+_replica_health = {}
+_replica_health_lock = threading.Lock()
+
+_PG_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+@contextmanager
+def replica_reads():
+    """Send plain SELECTs issued inside the block to the read replica"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+def read_replica(f):
+    """Run a reporting view with its reads routed to the replica"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
+
+def _replica_lag(engine):
+    # REPLICA_LAG_PROBE replaces the built-in check, e.g. for local testing
+    probe = current_app.config.get('REPLICA_LAG_PROBE')
+    if probe is not None:
+        return probe(engine)
+    # Always round-trip to the replica so an unreachable one is caught here
+    # rather than on the first routed query
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            return float(conn.execute(_PG_LAG_QUERY).scalar() or 0)
+        conn.execute(text("SELECT 1"))
+        return 0
+
+def replica_is_healthy(engine):
+    """True if the replica answers and lags less than REPLICA_MAX_LAG_SECONDS.
+
+    The result is cached for REPLICA_CHECK_INTERVAL seconds so routing does
+    not add a round trip to every query.
+    """
+    interval = current_app.config.get('REPLICA_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _replica_health_lock:
+        checked = _replica_health.get(engine)
+        if checked is not None and now - checked[0] < interval:
+            return checked[1]
+
+    try:
+        lag = _replica_lag(engine)
+        healthy = lag <= current_app.config.get('REPLICA_MAX_LAG_SECONDS', 5)
+        if not healthy:
+            logger.warning(f"Replica lagging {lag:.1f}s, reading from primary")
+    except SQLAlchemyError as e:
+        logger.warning(f"Replica unavailable, reading from primary: {str(e)}")
+        healthy = False
+
+    with _replica_health_lock:
+        _replica_health[engine] = (now, healthy)
+    return healthy
+
+class RoutingSession(Session):
+    """Session that routes read-only statements to the replica bind.
+
+    Only SELECTs without FOR UPDATE issued inside ``replica_reads()`` are
+    routed; flushes, writes and everything else stay on the primary. Once
+    the session has pending changes or has flushed in the current
+    transaction it stays on the primary until commit/rollback, so it always
+    reads its own writes.
+    """
+
+    def _pinned_to_primary(self):
+        return (
+            self._flushing
+            or self.info.get('flushed')
+            or bool(self.new)
+            or bool(self.deleted)
+        )
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and _replica_reads.get()
+            and not self._pinned_to_primary()
+            and clause is not None
+            and getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and replica_is_healthy(engine):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _pin_after_flush(session, flush_context):
+    session.info['flushed'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _unpin(session):
+    session.info.pop('flushed', None)
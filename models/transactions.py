@@ -0,0 +1,130 @@
+import datetime
+import logging
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, func, insert, literal_column, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.database import (
+    db, Transaction, TransactionStatus, TransactionStatusHistory, TRANSACTION_TRANSITIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# Columns refreshed when a webhook moves the status forward; an empty value
+# never overwrites a stored one. Repeats of the current status change nothing.
+MUTABLE_COLUMNS = (
+    'customer_name', 'customer_phone', 'customer_email',
+    'product_name', 'total_price', 'pix_code',
+)
+
+_ALLOWED_PAIRS = [
+    (int(current), int(target))
+    for current, targets in TRANSACTION_TRANSITIONS.items()
+    for target in targets
+]
+
+def _dialect_insert():
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert
+    if dialect == 'sqlite':
+        return sqlite.insert
+    raise RuntimeError(f"Transaction upserts are not supported on {dialect}")
+
+def _price(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+def normalize_event(event):
+    """Reduce a webhook/JSON transaction payload to the stored columns.
+
+    Everything else (e.g. the ``address`` block, which is almost always
+    empty strings) is dropped.
+    """
+    transaction_id = event.get('transaction_id')
+    if transaction_id is None or not str(transaction_id).strip():
+        raise ValueError("Missing transaction_id")
+    row = {column: event.get(column) or None for column in MUTABLE_COLUMNS}
+    row['transaction_id'] = str(transaction_id).strip()
+    row['status'] = TransactionStatus.parse(event['status'])
+    row['total_price'] = _price(event.get('total_price'))
+    return row
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE that only moves along TRANSACTION_TRANSITIONS.
+
+    Built once per batch and run as an executemany, so it is compiled once
+    and SQLAlchemy batches the rows itself. RETURNING yields (pk, status) for
+    every row that was inserted or moved forward; regressions and repeats
+    fail the WHERE clause and come back empty.
+    """
+    table = Transaction.__table__
+    stmt = _dialect_insert()(table)
+    excluded = stmt.excluded
+    update = {column: func.coalesce(excluded[column], table.c[column]) for column in MUTABLE_COLUMNS}
+    update['status'] = excluded.status
+    update['updated_at'] = excluded.updated_at
+    # Literal codes rather than an expanding IN, which executemany rejects
+    allowed = or_(*[
+        and_(table.c.status == literal_column(str(current)),
+             excluded.status == literal_column(str(target)))
+        for current, target in _ALLOWED_PAIRS
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.transaction_id],
+        set_=update,
+        where=allowed,
+    ).returning(table.c.id, table.c.status)
+
+def ingest_transaction_events(events):
+    """Apply a batch of transaction webhook events.
+
+    Events are applied in the order given. Several events for the same
+    transaction_id are split across successive statements, since a single
+    upsert cannot touch the same row twice. Every applied status is appended
+    to TransactionStatusHistory. The caller owns the commit.
+
+    Returns a dict with ``applied``, ``rejected`` and ``invalid`` counts.
+    """
+    rounds = []
+    seen = {}
+    invalid = 0
+    for event in events:
+        try:
+            row = normalize_event(event)
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping transaction event: {str(e)}")
+            invalid += 1
+            continue
+        index = seen.get(row['transaction_id'], 0)
+        seen[row['transaction_id']] = index + 1
+        if index == len(rounds):
+            rounds.append([])
+        rounds[index].append(row)
+
+    applied = 0
+    total = 0
+    now = datetime.datetime.utcnow()
+    stmt = _upsert_statement()
+    for rows in rounds:
+        total += len(rows)
+        changed = db.session.execute(stmt, [
+            dict(row, created_at=now, updated_at=now) for row in rows
+        ]).all()
+        if changed:
+            db.session.execute(insert(TransactionStatusHistory), [
+                {'transaction_id': pk, 'status': status, 'created_at': now}
+                for pk, status in changed
+            ])
+        applied += len(changed)
+
+    return {'applied': applied, 'rejected': total - applied, 'invalid': invalid}
+
+def ingest_transaction_event(event):
+    """Apply a single webhook event; True if it changed the stored status"""
+    return ingest_transaction_events([event])['applied'] == 1
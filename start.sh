@@ -18,6 +18,13 @@ timeout 10 bash -c 'until redis-cli ping &>/dev/null; do sleep 1; done' || {
     exit 1
 }
 
+# Create any missing database tables
+echo "Checking database schema..."
+if ! flask --app app init-db; then
+    echo "Error: Failed to initialize database schema"
+    exit 1
+fi
+
 # Start Celery worker
 echo "Starting Celery worker..."
 celery -A celery_worker worker --loglevel=info &
@@ -0,0 +1,87 @@
+"""enqueue_batch() must push the same envelope apply_async would.
+
+Runs against fakeredis so kombu/Celery upgrades that change the message
+format show up here instead of as messages workers reject.
+"""
+import base64
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from kombu.transport import redis as kombu_redis
+
+import celery_worker
+from celery_worker import celery, enqueue_batch, send_sms_task, _batch_supported
+
+QUEUE = 'test_enqueue_batch'
+
+# Fields that legitimately differ between two publishes of the same call
+PER_MESSAGE_HEADERS = {'id', 'root_id', 'origin'}
+PER_MESSAGE_PROPERTIES = {'correlation_id', 'reply_to', 'delivery_tag'}
+
+@pytest.fixture
+def broker(monkeypatch):
+    connection = getattr(fakeredis, 'FakeRedisConnection', None) or fakeredis.FakeConnection
+    monkeypatch.setattr(kombu_redis.Channel, 'connection_class', connection)
+    # Result subscriptions do not change the message; keep the backend out of it
+    monkeypatch.setattr(type(celery.backend), 'on_task_call', lambda self, producer, task_id: None)
+    # Pooled connections are opened lazily, so they all pick up the fake
+    with celery.connection_for_write() as conn:
+        client = conn.default_channel.client
+        client.delete(QUEUE)
+        yield client
+        client.delete(QUEUE)
+
+def _pop(client):
+    message = json.loads(client.rpop(QUEUE))
+    message['body'] = json.loads(base64.b64decode(message['body']))
+    for key in PER_MESSAGE_HEADERS:
+        message['headers'].pop(key)
+    for key in PER_MESSAGE_PROPERTIES:
+        message['properties'].pop(key)
+    return message
+
+def test_batch_envelope_matches_apply_async(broker):
+    kwargs = {'phone': '5511999990000', 'message': 'Seu pedido foi aprovado', 'event_type': 'campaign'}
+    assert _batch_supported(send_sms_task)
+
+    [batch_id] = enqueue_batch(send_sms_task, [kwargs], queue=QUEUE)
+    send_sms_task.apply_async(kwargs=kwargs, queue=QUEUE)
+
+    batched, published = _pop(broker), _pop(broker)
+    assert batched == published
+    assert broker.llen(QUEUE) == 0
+    assert len(batch_id) == 36
+
+def test_batch_preserves_order_across_chunks(broker):
+    calls = [{'phone': f'55119{i:08d}', 'message': 'm'} for i in range(5)]
+    task_ids = enqueue_batch(send_sms_task, calls, queue=QUEUE, chunk_size=2)
+
+    popped = [json.loads(broker.rpop(QUEUE))['headers']['id'] for _ in calls]
+    assert popped == task_ids
+
+def test_kwargsrepr_is_capped(broker):
+    enqueue_batch(send_sms_task, [{'phone': '1', 'message': 'x' * 5000}], queue=QUEUE)
+    message = json.loads(broker.rpop(QUEUE))
+    assert len(message['headers']['kwargsrepr']) == celery.amqp.kwargsrepr_maxsize
+
+@pytest.mark.parametrize('options', [
+    {'time_limit': 30},
+    {'soft_time_limit': 20},
+    {'expires': 60},
+    {'priority': 5},
+    {'ignore_result': True},
+    {'queue': 'other'},
+])
+def test_task_publish_options_fall_back(options):
+    def noop(**kwargs):
+        pass
+    task = celery.task(name=f"tests.noop_{'_'.join(options)}", **options)(noop)
+    assert not _batch_supported(task)
+
+def test_fallback_publishes_every_call(broker, monkeypatch):
+    monkeypatch.setattr(celery_worker, '_batch_supported', lambda task: False)
+    task_ids = enqueue_batch(send_sms_task, [{'phone': '1', 'message': 'a'}] * 2, queue=QUEUE)
+    assert broker.llen(QUEUE) == len(task_ids) == 2